@@ -1,114 +1,220 @@
+import hashlib
+import os
 import pandas as pd
 import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import Tuple, Dict, List
+from sklearn.preprocessing import normalize
+from typing import Tuple, Dict, List, Optional, Callable
 from config import (
     PRIORITY_WEIGHTS, 
     LINK_OPPORTUNITY_WEIGHTS,
     MIN_SIMILARITY_THRESHOLD,
     TOP_N_PAGES_TO_BOOST,
     TOP_K_SUGGESTIONS_PER_PAGE,
-    MAX_OUTLINKS_WARNING
+    MAX_OUTLINKS_WARNING,
+    DENSE_SIMILARITY_MAX_CELLS,
+    SIMILARITY_CACHE_DIR
 )
 
 
 class SEOAnalyzer:
     """Analyse le maillage interne et génère des recommandations"""
     
-    def __init__(self, merged_data: pd.DataFrame, inlinks_data: pd.DataFrame = None):
+    def __init__(self, merged_data: pd.DataFrame, inlinks_data: pd.DataFrame = None,
+                 cache_path: Optional[str] = SIMILARITY_CACHE_DIR):
         self.data = merged_data
         self.inlinks = inlinks_data
-        self.similarity_matrix = None
-        self.url_to_idx = {}
-        self.idx_to_url = {}
+        self._cache_path = cache_path
+        self._tfidf_matrix = None
+        self._tfidf_params = ''
+        self._addr_cat = None
+        self._priority_cache = None
     
     def calculate_priority_score(self) -> pd.DataFrame:
-        """Calcule le score de priorité pour chaque page"""
+        """Calcule le score de priorité pour chaque page (mis en cache par instance)"""
+        if self._priority_cache is not None:
+            return self._priority_cache
+        
         df = self.data.copy()
         
-        # S'assurer que toutes les colonnes nécessaires existent et sont numériques
-        for col in ['Impressions', 'Position', 'Link Score', 'Crawl Depth', 'Clicks']:
-            if col not in df.columns:
-                df[col] = 0 if col != 'Position' else 100
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0 if col != 'Position' else 100)
-        
-        # Remplacer les valeurs infinies ou invalides
-        df = df.replace([np.inf, -np.inf], np.nan)
-        df['Impressions'] = df['Impressions'].fillna(0).clip(lower=0)
-        df['Position'] = df['Position'].fillna(100).clip(lower=1, upper=100)
-        df['Link Score'] = df['Link Score'].fillna(0).clip(lower=0, upper=100)
-        df['Crawl Depth'] = df['Crawl Depth'].fillna(1).clip(lower=0)
-        
-        # Normalisation des métriques (0-1)
-        df['norm_impressions'] = self._normalize(df['Impressions'])
-        df['norm_position'] = self._normalize(1 / (df['Position'] + 1))  # Inverse car position basse = mieux
-        df['norm_link_score'] = self._normalize(1 / (df['Link Score'] + 1))  # Inverse car on cherche les faibles
-        df['norm_depth'] = self._normalize(1 / (df['Crawl Depth'] + 1))  # Inverse car profondeur faible = mieux
-        
-        # Calcul du score pondéré
+        # S'assurer que toutes les colonnes nécessaires existent et sont numériques,
+        # puis remplacer les valeurs manquantes, invalides ou infinies et borner,
+        # le tout en une seule passe sur le bloc de colonnes
+        numeric_cols = ['Impressions', 'Position', 'Link Score', 'Crawl Depth', 'Clicks']
+        defaults = np.array([0, 100, 0, 0, 0], dtype=float)
+        lower = np.array([0, 1, 0, 0, -np.inf])
+        upper = np.array([np.inf, 100, 100, np.inf, np.inf])
+        
+        values = df.reindex(columns=numeric_cols).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        values = np.clip(np.where(np.isfinite(values), values, defaults), lower, upper)
+        df[numeric_cols] = values
+        
+        # Métriques brutes sous forme de tableaux NumPy
+        impressions = values[:, 0]
+        position = 1 / (values[:, 1] + 1)  # Inverse car position basse = mieux
+        link_score = 1 / (values[:, 2] + 1)  # Inverse car on cherche les faibles
+        depth = 1 / (values[:, 3] + 1)  # Inverse car profondeur faible = mieux
+        
+        # Calcul du score pondéré sur les métriques normalisées (0-1)
         df['Priority_Score'] = (
-            df['norm_impressions'] * PRIORITY_WEIGHTS['impressions'] +
-            df['norm_position'] * PRIORITY_WEIGHTS['position'] +
-            df['norm_link_score'] * PRIORITY_WEIGHTS['link_score'] +
-            df['norm_depth'] * PRIORITY_WEIGHTS['depth']
+            self._normalize_np(impressions) * PRIORITY_WEIGHTS['impressions'] +
+            self._normalize_np(position) * PRIORITY_WEIGHTS['position'] +
+            self._normalize_np(link_score) * PRIORITY_WEIGHTS['link_score'] +
+            self._normalize_np(depth) * PRIORITY_WEIGHTS['depth']
         )
         
         # Remplacer les NaN dans Priority_Score par 0
         df['Priority_Score'] = df['Priority_Score'].fillna(0)
         
-        # Identifier le potentiel
-        impressions_median = df['Impressions'].median()
-        link_score_median = df['Link Score'].median()
+        # Identifier le potentiel (masque calculé directement sur les tableaux)
+        impressions_median, link_score_median = (
+            np.median(values[:, [0, 2]], axis=0) if len(values) else (np.nan, np.nan)
+        )
         
         df['Has_Potential'] = (
-            (df['Impressions'] > impressions_median) &
-            (df['Position'] > 10) &
-            (df['Link Score'] < link_score_median)
+            (values[:, 0] > impressions_median) &
+            (values[:, 1] > 10) &
+            (values[:, 2] < link_score_median)
         )
         
-        return df.sort_values('Priority_Score', ascending=False)
+        self._priority_cache = df.sort_values('Priority_Score', ascending=False)
+        return self._priority_cache
     
-    def compute_similarity_matrix(self, text_column: str = 'Address') -> np.ndarray:
-        """Calcule la matrice de similarité thématique basée sur les URLs"""
-        urls = self.data[text_column].fillna('').astype(str).tolist()
+    def _fit_tfidf(self, text_column: str = 'Address') -> sparse.csr_matrix:
+        """Vectorise les URLs en TF-IDF normalisé (une ligne par URL unique)"""
+        urls = self.data[text_column].fillna('').astype(str)
         
-        # Créer un mapping URL <-> index
-        self.url_to_idx = {url: idx for idx, url in enumerate(urls)}
-        self.idx_to_url = {idx: url for idx, url in enumerate(urls)}
+        # Index catégoriel des URLs : les lignes sont indexées par code de catégorie
+        self._addr_cat = pd.Categorical(urls)
         
-        # Vectorisation TF-IDF des URLs (mots-clés dans le chemin)
+        # Ne garder que le chemin des URLs (sans protocole, domaine ni paramètres),
+        # segments et mots séparés par des espaces
+        categories = pd.Series(self._addr_cat.categories)
+        paths = (
+            categories
+            .str.replace(r'^[a-zA-Z][a-zA-Z0-9+.-]*://[^/]*|[?#].*$', '', regex=True)
+            .str.replace(r'[/\-_]+', ' ', regex=True)
+        )
+        
+        # Chemin vide (page d'accueil, liste de domaines) : repli sur l'hôte, sinon l'URL brute,
+        # pour ne jamais vectoriser un document vide
+        hosts = categories.str.extract(r'^[a-zA-Z][a-zA-Z0-9+.-]*://([^/?#]+)', expand=False)
+        paths = paths.where(paths.str.strip() != '', hosts.fillna(categories))
+        
+        # Vectorisation TF-IDF des chemins en n-grammes de caractères : vocabulaire
+        # borné et nombre de termes par URL prévisible
         # Pour une meilleure précision, utiliser Title + H1 si disponibles
         vectorizer = TfidfVectorizer(
+            analyzer='char_wb',
+            ngram_range=(3, 5),
             max_features=1000,
-            ngram_range=(1, 2),
-            token_pattern=r'\b\w+\b',
-            stop_words='english'
+            sublinear_tf=True,
+            dtype=np.float32  # Précision suffisante pour une comparaison à un seuil
+        )
+        self._tfidf_params = repr(vectorizer)
+        
+        # Lignes de norme 1 : le produit scalaire donne directement le cosinus
+        self._tfidf_matrix = self._cached_sparse(
+            'tfidf',
+            lambda: normalize(vectorizer.fit_transform(paths), norm='l2', copy=False),
+            self._tfidf_params
         )
+        return self._tfidf_matrix
+    
+    def _cached_sparse(self, name: str, compute: Callable[[], sparse.spmatrix],
+                       params: str = '') -> sparse.csr_matrix:
+        """Charge une matrice creuse depuis le cache disque, ou la calcule et l'enregistre"""
+        if self._cache_path is None:
+            return compute()
+        
+        # Clé de cache : empreinte des paramètres de calcul et de la liste (triée)
+        # des URLs vectorisées
+        key = '\n'.join([params, *self._addr_cat.categories])
+        urls_hash = hashlib.md5(key.encode('utf-8')).hexdigest()
+        path = os.path.join(self._cache_path, f'{name}_{urls_hash}.npz')
         
-        tfidf_matrix = vectorizer.fit_transform(urls)
-        self.similarity_matrix = cosine_similarity(tfidf_matrix)
+        if os.path.exists(path):
+            return sparse.load_npz(path).tocsr()
         
-        return self.similarity_matrix
+        matrix = compute()
+        os.makedirs(self._cache_path, exist_ok=True)
+        sparse.save_npz(path, matrix)
+        return matrix
     
-    def get_existing_links(self) -> set:
-        """Récupère tous les liens existants (source, destination)"""
-        if self.inlinks is None:
-            return set()
+    def _similar_pairs(self, src_ix: np.ndarray,
+                       tgt_ix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Paires (source, cible) dont la similarité atteint le seuil : positions et similarités"""
+        sources = self._tfidf_matrix[src_ix]
+        targets = self._tfidf_matrix[tgt_ix]
+        
+        # Produit dense float32 (BLAS sgemm, vectorisé et multi-cœurs) si les
+        # blocs densifiés et la matrice résultat sources x cibles tiennent en mémoire
+        n_sources, n_targets = sources.shape[0], targets.shape[0]
+        if ((n_sources + n_targets) * sources.shape[1] <= DENSE_SIMILARITY_MAX_CELLS
+                and n_sources * n_targets <= DENSE_SIMILARITY_MAX_CELLS):
+            similarity = sources.toarray() @ targets.toarray().T
+            rows, cols = np.nonzero(similarity >= MIN_SIMILARITY_THRESHOLD)
+            return rows, cols, similarity[rows, cols]
         
-        existing = set()
-        for _, row in self.inlinks.iterrows():
-            existing.add((row['Source'], row['Destination']))
+        # Sinon produit creux, réparti par blocs de sources sur plusieurs threads
+        # (les produits creux de scipy s'exécutent hors du GIL)
+        targets_t = targets.T.tocsr()
+        blocks = [block for block in np.array_split(np.arange(sources.shape[0]), effective_n_jobs(-1)) if len(block)]
+        if not blocks:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, np.array([], dtype=np.float32)
         
-        return existing
+        results = Parallel(n_jobs=len(blocks), prefer='threads')(
+            delayed(self._sparse_pairs)(sources[block], targets_t, block[0]) for block in blocks
+        )
+        rows, cols, similarity = zip(*results)
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(similarity)
+    
+    @staticmethod
+    def _sparse_pairs(sources: sparse.csr_matrix, targets_t: sparse.csr_matrix,
+                      offset: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Paires d'un bloc de sources dont la similarité atteint le seuil"""
+        # Seules les entrées non nulles sont parcourues (le seuil étant positif,
+        # les paires sans terme commun sont écartées d'office)
+        pairs = (sources @ targets_t).tocoo()
+        kept = pairs.data >= MIN_SIMILARITY_THRESHOLD
+        return pairs.row[kept].astype(np.int64) + offset, pairs.col[kept].astype(np.int64), pairs.data[kept]
     
-    def calculate_outlinks_count(self) -> Dict[str, int]:
-        """Compte le nombre de liens sortants par page source"""
+    def _url_indices(self, urls: pd.Series) -> np.ndarray:
+        """Indices des URLs dans la matrice TF-IDF (-1 si inconnue)"""
+        if isinstance(urls.dtype, pd.CategoricalDtype):
+            # Résoudre une seule fois chaque catégorie, puis diffuser via les codes
+            # (le code -1 des valeurs manquantes pointe sur le -1 ajouté en fin)
+            category_idx = self._url_indices(pd.Series(urls.cat.categories))
+            return np.append(category_idx, -1)[urls.cat.codes.to_numpy()]
+        
+        urls = urls.astype(str).where(urls.notna(), '')
+        return self._addr_cat.categories.get_indexer(urls)
+    
+    def _existing_links_mask(self, src_ix: np.ndarray, tgt_ix: np.ndarray) -> np.ndarray:
+        """Indique pour chaque paire (src_ix[i], tgt_ix[i]) si le lien existe déjà"""
+        if self.inlinks is None or len(self.inlinks) == 0:
+            return np.zeros(len(src_ix), dtype=bool)
+        
+        # Encoder chaque lien (source, destination) en un entier unique
+        n = len(self._addr_cat.categories)
+        link_src = self._url_indices(self.inlinks['Source']).astype(np.int64)
+        link_dst = self._url_indices(self.inlinks['Destination']).astype(np.int64)
+        known = (link_src >= 0) & (link_dst >= 0)
+        existing_keys = link_src[known] * n + link_dst[known]
+        
+        return np.isin(src_ix * n + tgt_ix, existing_keys)
+    
+    def _outlinks_array(self) -> np.ndarray:
+        """Nombre de liens sortants de chaque URL, indexé comme la matrice TF-IDF"""
+        n = len(self._addr_cat.categories)
         if self.inlinks is None:
-            return {}
+            return np.zeros(n, dtype=np.int64)
         
-        outlinks_count = self.inlinks.groupby('Source').size().to_dict()
-        return outlinks_count
+        source_idx = self._url_indices(self.inlinks['Source'])
+        return np.bincount(source_idx[source_idx >= 0], minlength=n)
     
     def generate_link_opportunities(self, top_n: int = TOP_N_PAGES_TO_BOOST) -> pd.DataFrame:
         """Génère les opportunités de liens pour les pages prioritaires"""
@@ -116,95 +222,101 @@ class SEOAnalyzer:
         # Calculer les scores de priorité
         df_priority = self.calculate_priority_score()
         
-        # Calculer la similarité si pas déjà fait
-        if self.similarity_matrix is None:
-            self.compute_similarity_matrix()
-        
-        # Récupérer les liens existants
-        existing_links = self.get_existing_links()
-        outlinks_count = self.calculate_outlinks_count()
-        
-        # Sélectionner les pages cibles (à booster)
-        target_pages = df_priority.head(top_n)
-        
-        opportunities = []
-        
-        for _, target in target_pages.iterrows():
-            target_url = target['Address']
-            target_idx = self.url_to_idx.get(target_url)
-            
-            if target_idx is None:
-                continue
-            
-            # Trouver les pages sources candidates (fort Link Score)
-            sources = df_priority[
-                (df_priority['Link Score'] > df_priority['Link Score'].median()) &
-                (df_priority['Address'] != target_url)
-            ].copy()
-            
-            for _, source in sources.iterrows():
-                source_url = source['Address']
-                source_idx = self.url_to_idx.get(source_url)
-                
-                if source_idx is None:
-                    continue
-                
-                # Vérifier si le lien existe déjà
-                if (source_url, target_url) in existing_links:
-                    continue
-                
-                # Calculer la similarité
-                similarity = self.similarity_matrix[source_idx, target_idx]
-                
-                if similarity < MIN_SIMILARITY_THRESHOLD:
-                    continue
-                
-                # Calculer le score de l'opportunité
-                source_strength = source['Link Score'] / 100  # Normaliser
-                outlinks = outlinks_count.get(source_url, 0)
-                outlinks_penalty = 1 / (1 + outlinks / MAX_OUTLINKS_WARNING)
-                target_need = 1 / (1 + target['Unique Inlinks'])
-                
-                opportunity_score = (
-                    source_strength * LINK_OPPORTUNITY_WEIGHTS['source_strength'] +
-                    similarity * LINK_OPPORTUNITY_WEIGHTS['thematic_similarity'] +
-                    outlinks_penalty * LINK_OPPORTUNITY_WEIGHTS['outlinks_penalty'] +
-                    target_need * LINK_OPPORTUNITY_WEIGHTS['target_need']
-                )
-                
-                opportunities.append({
-                    'Source': source_url,
-                    'Target': target_url,
-                    'Source_LinkScore': source['Link Score'],
-                    'Target_LinkScore': target['Link Score'],
-                    'Target_Priority_Score': target['Priority_Score'],
-                    'Similarity': similarity,
-                    'Source_Outlinks': outlinks,
-                    'Target_Inlinks': target['Unique Inlinks'],
-                    'Target_Impressions': target['Impressions'],
-                    'Target_Position': target['Position'],
-                    'Opportunity_Score': opportunity_score
-                })
-        
-        # Convertir en DataFrame et trier
-        df_opportunities = pd.DataFrame(opportunities)
-        
-        if len(df_opportunities) == 0:
-            return df_opportunities
-        
-        df_opportunities = df_opportunities.sort_values('Opportunity_Score', ascending=False)
-        
-        # Limiter le nombre de suggestions par page cible
-        df_opportunities = df_opportunities.groupby('Target').head(TOP_K_SUGGESTIONS_PER_PAGE).reset_index(drop=True)
+        # Vectoriser les URLs si pas déjà fait
+        if self._tfidf_matrix is None:
+            self._fit_tfidf()
+        
+        # Colonnes utiles extraites une seule fois sous forme de tableaux
+        addresses = df_priority['Address'].to_numpy()
+        link_scores = df_priority['Link Score'].to_numpy()
+        inlinks = df_priority['Unique Inlinks'].to_numpy()
+        page_idx = self._url_indices(df_priority['Address']).astype(np.int64)
+        known = page_idx >= 0
+        
+        # Pages cibles (à booster) et sources candidates (fort Link Score),
+        # repérées par leur position dans df_priority : aucune copie de DataFrame
+        link_score_median = df_priority['Link Score'].median()
+        tgt_rows = np.flatnonzero(known[:top_n])
+        src_rows = np.flatnonzero(known & (link_scores > link_score_median))
+        src_ix, tgt_ix = page_idx[src_rows], page_idx[tgt_rows]
+        source_urls, target_urls = addresses[src_rows], addresses[tgt_rows]
+        
+        # Paires candidates au-dessus du seuil, limitées au bloc sources x cibles
+        rows, cols, similarity = self._similar_pairs(src_ix, tgt_ix)
+        
+        # Écarter les liens d'une page vers elle-même et les liens déjà existants
+        kept = (
+            (source_urls[rows] != target_urls[cols]) &
+            ~self._existing_links_mask(src_ix[rows], tgt_ix[cols])
+        )
+        rows, cols, similarity = rows[kept], cols[kept], similarity[kept]
+        
+        # Composantes du score, calculées par page puis rapportées à chaque paire
+        outlinks = self._outlinks_array()[src_ix]
+        source_strength = link_scores[src_rows].astype(float) / 100  # Normaliser
+        outlinks_penalty = 1 / (1 + outlinks / MAX_OUTLINKS_WARNING)
+        target_need = 1 / (1 + inlinks[tgt_rows].astype(float))
+        
+        scores = self._score_pairs(similarity, source_strength[rows], outlinks_penalty[rows], target_need[cols])
+        
+        # Top-K sources par page cible : tri par cible puis score décroissant,
+        # puis rang de chaque paire au sein de sa cible
+        order = np.lexsort((-scores, cols))
+        sorted_cols = cols[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_cols, sorted_cols)
+        order = order[rank < TOP_K_SUGGESTIONS_PER_PAGE]
+        
+        # Trier les suggestions retenues par score décroissant
+        order = order[np.argsort(-scores[order], kind='stable')]
+        rows, cols, similarity, scores = rows[order], cols[order], similarity[order], scores[order]
+        
+        # Positions des pages retenues dans df_priority
+        src_pos, tgt_pos = src_rows[rows], tgt_rows[cols]
+        
+        # Construire le DataFrame en une seule fois à partir des colonnes
+        # (tableaux déjà extraits, pas de copie supplémentaire)
+        df_opportunities = pd.DataFrame({
+            'Source': addresses[src_pos],
+            'Target': addresses[tgt_pos],
+            'Source_LinkScore': link_scores[src_pos],
+            'Target_LinkScore': link_scores[tgt_pos],
+            'Target_Priority_Score': df_priority['Priority_Score'].to_numpy()[tgt_pos],
+            'Similarity': similarity,
+            'Source_Outlinks': outlinks[rows],
+            'Target_Inlinks': inlinks[tgt_pos],
+            'Target_Impressions': df_priority['Impressions'].to_numpy()[tgt_pos],
+            'Target_Position': df_priority['Position'].to_numpy()[tgt_pos],
+            'Opportunity_Score': scores
+        }, copy=False)
         
         return df_opportunities
     
     @staticmethod
-    def _normalize(series: pd.Series) -> pd.Series:
-        """Normalise une série entre 0 et 1"""
-        if series.max() == series.min():
-            return series * 0
-        return (series - series.min()) / (series.max() - series.min())
+    def _score_pairs(similarity: np.ndarray, source_strength: np.ndarray, outlinks_penalty: np.ndarray,
+                     target_need: np.ndarray) -> np.ndarray:
+        """Score d'opportunité de chaque paire (source, cible), composantes alignées par paire"""
+        # Un buffer float32 pour le score et un buffer de travail réutilisé pour chaque
+        # terme pondéré (aucun temporaire float64)
+        scores = np.multiply(similarity, LINK_OPPORTUNITY_WEIGHTS['thematic_similarity'], dtype=np.float32)
+        term = np.empty_like(scores)
+        for values, weight in (
+            (source_strength, LINK_OPPORTUNITY_WEIGHTS['source_strength']),
+            (outlinks_penalty, LINK_OPPORTUNITY_WEIGHTS['outlinks_penalty']),
+            (target_need, LINK_OPPORTUNITY_WEIGHTS['target_need']),
+        ):
+            np.multiply(values, weight, out=term, casting='same_kind')
+            scores += term
+        return scores
+    
+    @staticmethod
+    def _normalize_np(values: np.ndarray) -> np.ndarray:
+        """Normalise un tableau entre 0 et 1"""
+        if values.size == 0:
+            return values
+        value_range = np.ptp(values)
+        if value_range == 0:
+            return np.zeros_like(values)
+        return (values - values.min()) / value_range
     
     def get_statistics(self) -> Dict:
         """Calcule des statistiques globales sur le maillage"""
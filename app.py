@@ -1,10 +1,112 @@
+import io
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from data_loader import DataLoader
-from analyzer import SEOAnalyzer
-from visualizer import SEOVisualizer
 from config import TOP_N_PAGES_TO_BOOST, TOP_K_SUGGESTIONS_PER_PAGE
 
+
+@st.cache_data(show_spinner=False)
+def _to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Encode un DataFrame en CSV avec le writer PyArrow (mis en cache par contenu)"""
+    buffer = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    return buffer.getvalue()
+
+
+@st.fragment
+def _opportunities_view(opportunities: pd.DataFrame):
+    """Filtres, tableau, détails et export des opportunités (rerun isolé du reste de l'app)"""
+    # Filtres
+    col1, col2 = st.columns(2)
+    with col1:
+        min_similarity = st.slider(
+            "Similarité minimale",
+            0.0, 1.0, 0.1, 0.05,
+            help="Filtrer les liens par pertinence thématique"
+        )
+    with col2:
+        min_source_ls = st.number_input(
+            "Link Score source min.",
+            0, 100, 0,
+            help="Filtrer par force de la page source"
+        )
+    
+    # Appliquer les filtres
+    filtered_opp = opportunities[
+        (opportunities['Similarity'] >= min_similarity) &
+        (opportunities['Source_LinkScore'] >= min_source_ls)
+    ]
+    
+    st.metric("Opportunités filtrées", len(filtered_opp))
+    
+    # Affichage du tableau
+    display_opp_cols = [
+        'Source', 'Target', 'Opportunity_Score', 'Similarity',
+        'Source_LinkScore', 'Target_LinkScore', 'Source_Outlinks',
+        'Target_Inlinks', 'Target_Impressions', 'Target_Position'
+    ]
+    
+    st.dataframe(
+        filtered_opp[display_opp_cols],
+        use_container_width=True,
+        height=500
+    )
+    
+    # Section détails pour une opportunité
+    st.markdown("---")
+    st.subheader("🔍 Détails d'une Opportunité")
+    
+    if len(filtered_opp) > 0:
+        # Libellés construits une fois en vectoriel plutôt qu'un .iloc par option
+        rank = pd.Series(range(1, len(filtered_opp) + 1), index=filtered_opp.index).astype(str)
+        labels = (
+            '#' + rank + ': ' + filtered_opp['Source'].str.slice(0, 50)
+            + '... → ' + filtered_opp['Target'].str.slice(0, 50) + '...'
+        ).tolist()
+        
+        selected_idx = st.selectbox(
+            "Sélectionnez une opportunité",
+            range(len(labels)),
+            format_func=labels.__getitem__
+        )
+        
+        selected = filtered_opp.iloc[selected_idx]
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("**📤 Page Source**")
+            st.write(f"URL: `{selected['Source']}`")
+            st.write(f"Link Score: **{selected['Source_LinkScore']:.1f}**")
+            st.write(f"Liens sortants actuels: {selected['Source_Outlinks']}")
+        
+        with col2:
+            st.markdown("**📥 Page Cible**")
+            st.write(f"URL: `{selected['Target']}`")
+            st.write(f"Link Score: **{selected['Target_LinkScore']:.1f}**")
+            st.write(f"Liens entrants: {selected['Target_Inlinks']}")
+            st.write(f"Impressions GSC: {selected['Target_Impressions']:.0f}")
+            st.write(f"Position: {selected['Target_Position']:.1f}")
+        
+        st.markdown("**📊 Scores**")
+        score_col1, score_col2, score_col3 = st.columns(3)
+        score_col1.metric("Score Opportunité", f"{selected['Opportunity_Score']:.3f}")
+        score_col2.metric("Similarité", f"{selected['Similarity']:.3f}")
+        score_col3.metric("Priorité Cible", f"{selected['Target_Priority_Score']:.3f}")
+    
+    # Export
+    csv_opportunities = _to_csv_bytes(filtered_opp)
+    st.download_button(
+        label="📥 Télécharger les recommandations (CSV)",
+        data=csv_opportunities,
+        file_name="opportunites_liens_seo.csv",
+        mime="text/csv",
+        type="primary"
+    )
+
+
 # Configuration de la page
 st.set_page_config(
     page_title="Optimiseur de Maillage Interne SEO",
@@ -49,7 +151,7 @@ with st.sidebar:
     st.subheader("1️⃣ Crawl Screaming Frog *")
     sf_file = st.file_uploader(
         "Export CSV/Excel du crawl",
-        type=['csv', 'xlsx'],
+        type=['csv', 'xlsx', 'parquet'],
         key='sf_file',
         help="Fichier contenant: Address, Link Score, Unique Inlinks, Crawl Depth"
     )
@@ -57,7 +159,7 @@ with st.sidebar:
     st.subheader("2️⃣ Google Search Console")
     gsc_file = st.file_uploader(
         "Export GSC (optionnel)",
-        type=['csv', 'xlsx'],
+        type=['csv', 'xlsx', 'parquet'],
         key='gsc_file',
         help="Données GSC: Page, Clicks, Impressions, CTR, Position"
     )
@@ -65,7 +167,7 @@ with st.sidebar:
     st.subheader("3️⃣ Liens Entrants Internes")
     inlinks_file = st.file_uploader(
         "Export des liens internes (optionnel)",
-        type=['csv', 'xlsx'],
+        type=['csv', 'xlsx', 'parquet'],
         key='inlinks_file',
         help="Fichier contenant: Source, Destination, Anchor"
     )
@@ -94,6 +196,9 @@ with st.sidebar:
                 
                 if st.session_state.merged_data is not None:
                     st.session_state.data_loaded = True
+                    st.session_state.opportunities = None
+                    for key in ('priority_data', 'stats'):
+                        st.session_state.pop(key, None)
                     st.rerun()
     
     if st.session_state.data_loaded:
@@ -103,7 +208,11 @@ with st.sidebar:
             st.session_state.data_loaded = False
             st.session_state.merged_data = None
             st.session_state.opportunities = None
+            for key in ('priority_data', 'stats'):
+                st.session_state.pop(key, None)
             st.rerun()
+    
+    st.checkbox("🐞 Mode debug", key='debug', help="Affiche la trace complète des erreurs de chargement")
 
 # Interface principale
 if not st.session_state.data_loaded:
@@ -150,6 +259,10 @@ if not st.session_state.data_loaded:
         """)
 
 else:
+    # Imports différés : scikit-learn / Plotly ne sont chargés qu'une fois les données présentes
+    from analyzer import SEOAnalyzer
+    from visualizer import SEOVisualizer
+    
     # Analyse des données
     analyzer = SEOAnalyzer(
         st.session_state.merged_data,
@@ -174,7 +287,9 @@ else:
     with tab1:
         st.header("📊 Statistiques Globales")
         
-        stats = analyzer.get_statistics()
+        if 'stats' not in st.session_state:
+            st.session_state.stats = analyzer.get_statistics()
+        stats = st.session_state.stats
         st.markdown(visualizer.display_stats_cards(stats), unsafe_allow_html=True)
         
         st.markdown("---")
@@ -200,8 +315,7 @@ else:
     with tab2:
         st.header("🎯 Pages à Prioriser pour le Maillage")
         
-        with st.spinner("Calcul des scores de priorité..."):
-            df_priority = analyzer.calculate_priority_score()
+        df_priority = st.session_state.priority_data
         
         st.markdown(f"""
         Les **{TOP_N_PAGES_TO_BOOST} pages** ci-dessous ont le plus fort potentiel d'amélioration.
@@ -217,29 +331,27 @@ else:
         with col3:
             show_potential_only = st.checkbox("Uniquement pages à fort potentiel", value=False)
         
-        # Appliquer les filtres
-        filtered = df_priority[
-            (df_priority['Impressions'] >= min_impressions) &
-            (df_priority['Position'] <= max_position)
-        ]
-        
-        if show_potential_only:
-            filtered = filtered[filtered['Has_Potential'] == True]
-        
-        # Affichage
         display_cols = [
             'Address', 'Priority_Score', 'Link Score', 'Unique Inlinks',
             'Crawl Depth', 'Impressions', 'Clicks', 'Position', 'Has_Potential'
         ]
         
+        # Appliquer les filtres : un seul masque, une seule sélection
+        # (les scores sont déjà triés par priorité, l'affichage prend les 100 premiers)
+        mask = (df_priority['Impressions'] >= min_impressions) & (df_priority['Position'] <= max_position)
+        if show_potential_only:
+            mask &= df_priority['Has_Potential']
+        filtered = df_priority.loc[mask, display_cols]
+        
+        # Affichage
         st.dataframe(
-            filtered[display_cols].head(100),
+            filtered.head(100),
             use_container_width=True,
             height=400
         )
         
         # Export
-        csv_priority = filtered[display_cols].to_csv(index=False).encode('utf-8')
+        csv_priority = _to_csv_bytes(filtered)
         st.download_button(
             label="📥 Télécharger les pages prioritaires (CSV)",
             data=csv_priority,
@@ -268,86 +380,7 @@ else:
             Les recommandations sont triées par score d'opportunité (pertinence × impact potentiel).
             """)
             
-            # Filtres
-            col1, col2 = st.columns(2)
-            with col1:
-                min_similarity = st.slider(
-                    "Similarité minimale",
-                    0.0, 1.0, 0.1, 0.05,
-                    help="Filtrer les liens par pertinence thématique"
-                )
-            with col2:
-                min_source_ls = st.number_input(
-                    "Link Score source min.",
-                    0, 100, 0,
-                    help="Filtrer par force de la page source"
-                )
-            
-            # Appliquer les filtres
-            filtered_opp = opportunities[
-                (opportunities['Similarity'] >= min_similarity) &
-                (opportunities['Source_LinkScore'] >= min_source_ls)
-            ]
-            
-            st.metric("Opportunités filtrées", len(filtered_opp))
-            
-            # Affichage du tableau
-            display_opp_cols = [
-                'Source', 'Target', 'Opportunity_Score', 'Similarity',
-                'Source_LinkScore', 'Target_LinkScore', 'Source_Outlinks',
-                'Target_Inlinks', 'Target_Impressions', 'Target_Position'
-            ]
-            
-            st.dataframe(
-                filtered_opp[display_opp_cols],
-                use_container_width=True,
-                height=500
-            )
-            
-            # Section détails pour une opportunité
-            st.markdown("---")
-            st.subheader("🔍 Détails d'une Opportunité")
-            
-            if len(filtered_opp) > 0:
-                selected_idx = st.selectbox(
-                    "Sélectionnez une opportunité",
-                    range(len(filtered_opp)),
-                    format_func=lambda x: f"#{x+1}: {filtered_opp.iloc[x]['Source'][:50]}... → {filtered_opp.iloc[x]['Target'][:50]}..."
-                )
-                
-                selected = filtered_opp.iloc[selected_idx]
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown("**📤 Page Source**")
-                    st.write(f"URL: `{selected['Source']}`")
-                    st.write(f"Link Score: **{selected['Source_LinkScore']:.1f}**")
-                    st.write(f"Liens sortants actuels: {selected['Source_Outlinks']}")
-                
-                with col2:
-                    st.markdown("**📥 Page Cible**")
-                    st.write(f"URL: `{selected['Target']}`")
-                    st.write(f"Link Score: **{selected['Target_LinkScore']:.1f}**")
-                    st.write(f"Liens entrants: {selected['Target_Inlinks']}")
-                    st.write(f"Impressions GSC: {selected['Target_Impressions']:.0f}")
-                    st.write(f"Position: {selected['Target_Position']:.1f}")
-                
-                st.markdown("**📊 Scores**")
-                score_col1, score_col2, score_col3 = st.columns(3)
-                score_col1.metric("Score Opportunité", f"{selected['Opportunity_Score']:.3f}")
-                score_col2.metric("Similarité", f"{selected['Similarity']:.3f}")
-                score_col3.metric("Priorité Cible", f"{selected['Target_Priority_Score']:.3f}")
-            
-            # Export
-            csv_opportunities = filtered_opp.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="📥 Télécharger les recommandations (CSV)",
-                data=csv_opportunities,
-                file_name="opportunites_liens_seo.csv",
-                mime="text/csv",
-                type="primary"
-            )
+            _opportunities_view(opportunities)
     
     # TAB 4: Visualisations
     with tab4:
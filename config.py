@@ -21,6 +21,11 @@ MIN_SIMILARITY_THRESHOLD = 0.1  # Similarité minimale pour considérer un lien
 MAX_OUTLINKS_WARNING = 100  # Seuil d'alerte pour trop de liens sortants
 TOP_N_PAGES_TO_BOOST = 50  # Nombre de pages prioritaires à analyser
 TOP_K_SUGGESTIONS_PER_PAGE = 10  # Nombre de suggestions par page cible
+DENSE_SIMILARITY_MAX_CELLS = 20_000_000  # Taille max des blocs TF-IDF densifiés et du résultat dense (produit BLAS)
+SIMILARITY_CACHE_DIR = None  # Dossier de cache disque de la matrice TF-IDF (None = désactivé)
+SCATTER_MAX_POINTS = 10_000  # Nombre max de pages affichées dans les nuages de points (échantillon au-delà)
+NETWORK_MAX_LINKS = 2000  # Nombre max de liens tracés dans le graphe de maillage
+NETWORK_MAX_LABELED_LINKS = 200  # Au-delà, noeuds du graphe sans étiquette texte
 
 # Colonnes attendues du crawl Screaming Frog
 SF_REQUIRED_COLUMNS = [
@@ -1,7 +1,73 @@
+import hashlib
+import importlib.util
+import io
+import os
+import traceback
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import streamlit as st
 from typing import Optional, Dict, List
 
+__all__ = ['DataLoader']
+
+
+# Lecteur Excel natif (Rust) si disponible, sinon moteur pandas par défaut (openpyxl)
+_EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else None
+
+
+# Valeurs par défaut et types compacts des métriques GSC
+_GSC_DEFAULTS = {'Clicks': 0, 'Impressions': 0, 'Position': 100, 'CTR': 0}
+_GSC_DTYPES = {'Clicks': 'int32', 'Impressions': 'int32', 'Position': 'float32', 'CTR': 'float32'}
+
+# Noms de colonnes reconnus par fichier (FR + EN), construits une seule fois
+_SF_COLUMN_MAPPING = {
+    'Address': ('address', 'adresse', 'url', 'page url', 'page', 'source'),
+    'Link Score': ('link score', 'linkscore', 'score', 'link equity'),
+    'Unique Inlinks': ('unique inlinks', 'inlinks', 'unique inlink', 'liens entrants uniques', 
+                       'liens entrants', 'inbound links', 'internal links in'),
+    'Crawl Depth': ('crawl depth', 'depth', 'crawl profondeur', 'profondeur', 'distance', 'level'),
+    'Status Code': ('status code', 'status', 'code http', 'http status code', 'code de statut', 
+                   'response code', 'code'),
+    'Indexability': ('indexability', 'indexable', 'indexabilité', 'indexabilite', 
+                    'index status', 'indexability status', 'statut indexabilité')
+}
+
+# Données GSC éventuellement intégrées au crawl SF
+_SF_GSC_COLUMN_MAPPING = {
+    'Clicks': ('clicks', 'clics', 'click'),
+    'Impressions': ('impressions', 'impression'),
+    'CTR': ('ctr', 'click-through rate', 'taux de clic'),
+    'Position': ('position', 'pos', 'avg position')
+}
+
+# Mapping des colonnes GSC (FR + EN)
+_GSC_COLUMN_MAPPING = {
+    'Page': ('page', 'pages les plus populaires', 'url', 'landing page', 
+            'top pages', 'page url', 'pages'),
+    'Clicks': ('clicks', 'clics', 'click', 'clic'),
+    'Impressions': ('impressions', 'impression', 'impress'),
+    'CTR': ('ctr', 'click-through rate', 'taux de clic'),
+    'Position': ('position', 'avg position', 'average position', 'pos')
+}
+
+# Mapping des colonnes de liens (FR + EN)
+_INLINKS_COLUMN_MAPPING = {
+    'Source': ('source', 'de', 'from', 'source url', 'source address', 'link from'),
+    'Destination': ('destination', 'à', 'a', 'target', 'to', 'destination url', 
+                   'destination address', 'link to'),
+    'Anchor': ('anchor', "texte d'ancrage", "texte d ancrage", 'anchor text', 
+              'link text', 'ancre', 'text')
+}
+
+
+def _hash_upload(data: bytes) -> bytes:
+    """Empreinte rapide du contenu d'un upload pour les clés de cache"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
 
 class DataLoader:
     """Classe pour charger et valider les données d'entrée (FR/EN)"""
@@ -9,13 +75,21 @@ class DataLoader:
     def __init__(self):
         self.crawl_data = None
         self.gsc_data = None
+        self.gsc_in_sf = False
         self.inlinks_data = None
         self.html_content = None
     
     @staticmethod
-    def find_column(df: pd.DataFrame, possible_names: List[str]) -> Optional[str]:
+    def lowered_columns(columns: pd.Index) -> Dict[str, str]:
+        """Associe chaque nom de colonne normalisé (minuscules, sans espaces) à son nom réel"""
+        return dict(zip(columns.str.lower().str.strip(), columns))
+    
+    @staticmethod
+    def find_column(df: pd.DataFrame, possible_names: List[str],
+                    df_cols_lower: Optional[Dict[str, str]] = None) -> Optional[str]:
         """Trouve une colonne en testant plusieurs noms possibles (insensible à la casse)"""
-        df_cols_lower = {col.lower().strip(): col for col in df.columns}
+        if df_cols_lower is None:
+            df_cols_lower = DataLoader.lowered_columns(df.columns)
         
         for name in possible_names:
             name_lower = name.lower().strip()
@@ -24,58 +98,176 @@ class DataLoader:
         return None
     
     @staticmethod
-    def normalize_column_names(df: pd.DataFrame, column_mapping: Dict[str, List[str]]) -> pd.DataFrame:
+    def normalize_column_names(df: pd.DataFrame, column_mapping: Dict[str, List[str]],
+                               df_cols_lower: Optional[Dict[str, str]] = None) -> pd.DataFrame:
         """Normalise les noms de colonnes selon un mapping de noms possibles"""
-        df = df.copy()
+        # Noms normalisés calculés une seule fois (ou fournis et tenus à jour), puis un unique renommage
+        if df_cols_lower is None:
+            df_cols_lower = DataLoader.lowered_columns(df.columns)
+        renames = {}
         
         for standard_name, possible_names in column_mapping.items():
-            found_col = DataLoader.find_column(df, possible_names)
+            # Déjà au nom standard (exports SF/GSC en anglais) : rien à chercher
+            if standard_name in df.columns:
+                continue
+            found_col = DataLoader.find_column(df, possible_names, df_cols_lower)
             if found_col and found_col != standard_name:
-                df.rename(columns={found_col: standard_name}, inplace=True)
+                renames[found_col] = standard_name
+                # Refléter le renommage pour les mappings suivants
+                del df_cols_lower[found_col.lower().strip()]
+                df_cols_lower[standard_name.lower().strip()] = standard_name
         
+        return df.rename(columns=renames)
+    
+    @staticmethod
+    def to_numeric_columns(df: pd.DataFrame, defaults: Dict[str, float], dtypes: Dict[str, str]) -> pd.DataFrame:
+        """Convertit les colonnes en numérique typé, valeurs invalides ou manquantes = défaut"""
+        columns = {}
+        for col, default in defaults.items():
+            values = df[col]
+            # Colonnes déjà typées par le lecteur (cas courant) : ni conversion ni fillna inutiles
+            if not pd.api.types.is_numeric_dtype(values):
+                values = pd.to_numeric(values, errors='coerce')
+            if values.hasnans:
+                values = values.fillna(default)
+            dtype = np.dtype(dtypes[col])
+            if dtype.kind == 'i' and not values.between(np.iinfo(dtype).min, np.iinfo(dtype).max).all():
+                # Valeurs hors bornes (sentinelles, infinis) : type large conservé plutôt qu'un débordement
+                columns[col] = values
+                continue
+            columns[col] = values.astype(dtype)
+        return df.assign(**columns)
+    
+    @staticmethod
+    def url_key(urls: pd.Series) -> pd.Index:
+        """Empreinte uint64 de l'URL normalisée (minuscules, sans espaces ni slash final) pour le matching"""
+        # Noyaux Arrow enchaînés en C, sans Series intermédiaires côté pandas
+        key = pc.utf8_lower(pa.array(urls, type=pa.string(), from_pandas=True))
+        key = pc.utf8_rtrim(pc.utf8_trim_whitespace(key), characters='/')
+        # Jointure sur des entiers 64 bits : chaque chaîne n'est hachée qu'une fois, au chargement
+        return pd.Index(pd.util.hash_array(key.to_numpy(zero_copy_only=False)))
+    
+    @staticmethod
+    def known_columns(header, column_mappings: List[Dict[str, List[str]]]) -> List[str]:
+        """Colonnes de l'en-tête reconnues par au moins un mapping (FR/EN)"""
+        known_names = {
+            name.lower().strip()
+            for mapping in column_mappings
+            for standard_name, possible_names in mapping.items()
+            for name in [standard_name, *possible_names]
+        }
+        return [col for col in header if str(col).lower().strip() in known_names]
+    
+    @staticmethod
+    def with_source_columns(df: pd.DataFrame, header, keep: List[str]) -> pd.DataFrame:
+        """Mémorise l'en-tête complet du fichier et les colonnes effectivement chargées"""
+        df.attrs['source_columns'] = [str(col).strip() for col in header]
+        df.attrs['loaded_columns'] = [str(col).strip() for col in (keep or header)]
+        return df
+    
+    @staticmethod
+    def available_columns(df: pd.DataFrame) -> List[str]:
+        """En-tête complet du fichier source, colonnes chargées sous leur nom courant (normalisé)"""
+        header = df.attrs.get('source_columns')
+        if header is None:
+            return list(df.columns)
+        # Les colonnes chargées sont en tête du DataFrame, dans l'ordre de l'en-tête
+        current = dict(zip(df.attrs['loaded_columns'], df.columns))
+        return [current.get(col, col) for col in header]
+    
+    @staticmethod
+    def read_csv_columns(file, column_mappings: List[Dict[str, List[str]]]) -> pd.DataFrame:
+        """Lit un CSV avec PyArrow en ne chargeant que les colonnes reconnues par les mappings"""
+        read_options = pacsv.ReadOptions(use_threads=True, encoding='utf-8')
+        # Champs entre guillemets sur plusieurs lignes (ancres, meta descriptions) fréquents dans les exports SF
+        parse_options = pacsv.ParseOptions(newlines_in_values=True)
+        
+        # Lire uniquement le premier bloc pour repérer les colonnes utiles (FR/EN)
+        header = pacsv.open_csv(file, read_options=read_options, parse_options=parse_options).schema.names
+        file.seek(0)
+        keep = DataLoader.known_columns(header, column_mappings)
+        
+        # Les colonnes non retenues ne sont jamais converties ni allouées
+        # (sans colonne reconnue, tout est lu pour pouvoir afficher les colonnes disponibles)
+        table = pacsv.read_csv(
+            file,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=pacsv.ConvertOptions(include_columns=keep, strings_can_be_null=True)
+        )
+        # Noms nettoyés sur les métadonnées Arrow, avant la conversion pandas
+        table = table.rename_columns([name.strip() for name in table.column_names])
+        df = table.to_pandas(self_destruct=True, split_blocks=True)
+        return DataLoader.with_source_columns(df, header, keep)
+    
+    @staticmethod
+    def read_parquet_columns(file, column_mappings: List[Dict[str, List[str]]]) -> pd.DataFrame:
+        """Lit un Parquet en ne chargeant que les colonnes reconnues par les mappings"""
+        header = pq.read_schema(file).names
+        keep = DataLoader.known_columns(header, column_mappings)
+        file.seek(0)
+        df = pd.read_parquet(file, columns=keep or None)
+        return DataLoader.with_source_columns(df, header, keep)
+    
+    @staticmethod
+    def read_excel_sheet(file, column_mappings: List[Dict[str, List[str]]],
+                         sheet_keywords: List[str]) -> pd.DataFrame:
+        """Lit la première feuille Excel dont le nom contient un des mots-clés (sinon la première)"""
+        excel_file = pd.ExcelFile(file, engine=_EXCEL_ENGINE)
+        sheet_name = None
+        for name in excel_file.sheet_names:
+            if any(keyword in name.lower() for keyword in sheet_keywords):
+                sheet_name = name
+                break
+        
+        if sheet_name is None:
+            sheet_name = excel_file.sheet_names[0]
+        
+        st.info(f"📑 Lecture de la feuille: {sheet_name}")
+        
+        # Une seule lecture de la feuille (nrows=0 la parcourt aussi entièrement),
+        # puis sélection des colonnes reconnues
+        df = excel_file.parse(sheet_name=sheet_name)
+        header = df.columns
+        keep = DataLoader.known_columns(header, column_mappings)
+        if keep:
+            df = df[keep]
+        return DataLoader.with_source_columns(df, header, keep)
+    
+    @staticmethod
+    def read_table(data: bytes, file_name: str, column_mappings: List[Dict[str, List[str]]],
+                   sheet_keywords: List[str]) -> pd.DataFrame:
+        """Lit l'upload avec le lecteur associé à son extension (Excel par défaut), noms de colonnes nettoyés"""
+        ext = os.path.splitext(file_name)[1].lower()
+        reader = _READERS.get(ext, _READERS['.xlsx'])
+        df = reader(io.BytesIO(data), column_mappings, sheet_keywords)
+        if ext != '.csv':
+            df.columns = df.columns.str.strip()
         return df
     
     def load_screaming_frog(self, file) -> Optional[pd.DataFrame]:
         """Charge le fichier de crawl Screaming Frog"""
+        df = self._parse_screaming_frog(file.getvalue(), file.name, st.session_state.get('debug', False))
+        if df is not None:
+            self.crawl_data = df
+            self.gsc_in_sf = all(col in df.columns for col in ['Clicks', 'Impressions', 'Position'])
+        return df
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=4, hash_funcs={bytes: _hash_upload})
+    def _parse_screaming_frog(data: bytes, file_name: str, debug: bool = False) -> Optional[pd.DataFrame]:
+        """Lit et nettoie le crawl Screaming Frog (mis en cache sur le contenu du fichier et le mode debug)"""
         try:
             # Chargement du fichier
-            if file.name.endswith('.csv'):
-                df = pd.read_csv(file, encoding='utf-8-sig')
-            else:
-                # Pour Excel, lire la première feuille qui contient "HTML" ou "Interne"
-                excel_file = pd.ExcelFile(file)
-                sheet_name = None
-                for name in excel_file.sheet_names:
-                    if 'html' in name.lower() or 'interne' in name.lower():
-                        sheet_name = name
-                        break
-                
-                if sheet_name is None:
-                    sheet_name = excel_file.sheet_names[0]
-                
-                st.info(f"📑 Lecture de la feuille: {sheet_name}")
-                df = pd.read_excel(file, sheet_name=sheet_name)
-            
-            # Nettoyage des noms de colonnes
-            df.columns = df.columns.str.strip()
+            df = DataLoader.read_table(data, file_name, [_SF_COLUMN_MAPPING, _SF_GSC_COLUMN_MAPPING], ['html', 'interne'])
             
-            st.info(f"📋 {len(df.columns)} colonnes détectées. Premières: {', '.join(list(df.columns)[:5])}...")
+            available = DataLoader.available_columns(df)
+            st.info(f"📋 {len(available)} colonnes détectées. Premières: {', '.join(available[:5])}...")
             
-            # Mapping des colonnes possibles (FR + EN)
-            column_mapping = {
-                'Address': ['address', 'adresse', 'url', 'page url', 'page', 'source'],
-                'Link Score': ['link score', 'linkscore', 'score', 'link equity'],
-                'Unique Inlinks': ['unique inlinks', 'inlinks', 'unique inlink', 'liens entrants uniques', 
-                                   'liens entrants', 'inbound links', 'internal links in'],
-                'Crawl Depth': ['crawl depth', 'depth', 'crawl profondeur', 'profondeur', 'distance', 'level'],
-                'Status Code': ['status code', 'status', 'code http', 'http status code', 'code de statut', 
-                               'response code', 'code'],
-                'Indexability': ['indexability', 'indexable', 'indexabilité', 'indexabilite', 
-                                'index status', 'indexability status', 'statut indexabilité']
-            }
-            
-            # Normaliser les colonnes
-            df = self.normalize_column_names(df, column_mapping)
+            # Normaliser les colonnes (index des noms en minuscules construit une fois pour
+            # tout le chargement : les colonnes ajoutées ensuite ne sont jamais recherchées)
+            df_cols_lower = DataLoader.lowered_columns(df.columns)
+            df = DataLoader.normalize_column_names(df, _SF_COLUMN_MAPPING, df_cols_lower)
             
             # Vérifier les colonnes manquantes
             missing = []
@@ -85,7 +277,8 @@ class DataLoader:
             
             if 'Address' not in df.columns:
                 st.error("❌ Impossible de trouver la colonne URL/Address/Adresse.")
-                st.info(f"Colonnes disponibles: {', '.join(df.columns[:20])}")
+                # En-tête complet du fichier (les colonnes non reconnues n'ont pas été chargées)
+                st.info(f"Colonnes disponibles: {', '.join(DataLoader.available_columns(df)[:20])}")
                 return None
             
             if missing:
@@ -104,97 +297,92 @@ class DataLoader:
                 df['Crawl Depth'] = 1
                 st.info("ℹ️ Colonne 'Crawl Depth' absente, valeurs = 1")
             
-            # Nettoyage des données
-            df['Link Score'] = pd.to_numeric(df['Link Score'], errors='coerce').fillna(0)
-            df['Unique Inlinks'] = pd.to_numeric(df['Unique Inlinks'], errors='coerce').fillna(0)
-            df['Crawl Depth'] = pd.to_numeric(df['Crawl Depth'], errors='coerce').fillna(1)
-            
-            # Filtrer les pages indexables avec status 200 (si disponible)
+            # Filtrer les pages indexables avec status 200 (si disponible) :
+            # un seul masque, une seule sélection, avant le nettoyage numérique
             initial_count = len(df)
+            keep = pd.Series(True, index=df.index)
             
             if 'Status Code' in df.columns:
                 df['Status Code'] = pd.to_numeric(df['Status Code'], errors='coerce')
-                df = df[df['Status Code'] == 200]
-                st.info(f"✅ Filtrage Status Code 200: {len(df)}/{initial_count} pages conservées")
+                keep &= df['Status Code'] == 200
+                st.info(f"✅ Filtrage Status Code 200: {keep.sum()}/{initial_count} pages conservées")
             
             if 'Indexability' in df.columns:
-                df = df[df['Indexability'].str.lower().str.contains('indexable', na=False)]
-                st.info(f"✅ Filtrage pages indexables: {len(df)} pages conservées")
+                # Catégories : le test de texte ne porte que sur les valeurs distinctes
+                # ("Non-Indexable" contient aussi "indexable" et doit être exclu)
+                df['Indexability'] = df['Indexability'].astype('category')
+                categories = df['Indexability'].cat.categories
+                labels = categories.astype(str).str.lower()
+                indexable = categories[labels.str.contains('indexable') & ~labels.str.contains('non')]
+                keep &= df['Indexability'].isin(indexable)
+                st.info(f"✅ Filtrage pages indexables: {keep.sum()} pages conservées")
+            
+            if not keep.all():
+                df = df[keep]
+            
+            # Nettoyage des données (types compacts : ces champs tiennent largement sur 16/32 bits)
+            df = DataLoader.to_numeric_columns(
+                df,
+                {'Link Score': 0, 'Unique Inlinks': 0, 'Crawl Depth': 1},
+                {'Link Score': 'float32', 'Unique Inlinks': 'int32', 'Crawl Depth': 'int16'}
+            )
             
             # Vérifier si GSC est déjà intégré dans le crawl SF
             gsc_columns_in_sf = []
             for col_name in ['Clics', 'Clicks', 'Impressions', 'Position', 'CTR']:
-                found = self.find_column(df, [col_name])
+                found = DataLoader.find_column(df, [col_name], df_cols_lower)
                 if found:
                     gsc_columns_in_sf.append(found)
             
             if gsc_columns_in_sf:
                 st.success(f"✨ Données GSC détectées dans le crawl SF: {', '.join(gsc_columns_in_sf)}")
                 # Normaliser les noms
-                gsc_mapping = {
-                    'Clicks': ['clicks', 'clics', 'click'],
-                    'Impressions': ['impressions', 'impression'],
-                    'CTR': ['ctr', 'click-through rate', 'taux de clic'],
-                    'Position': ['position', 'pos', 'avg position']
-                }
-                df = self.normalize_column_names(df, gsc_mapping)
+                df = DataLoader.normalize_column_names(df, _SF_GSC_COLUMN_MAPPING, df_cols_lower)
+                
+                # Crawl autonome (Clicks, Impressions, Position) : métriques typées dès le chargement
+                if all(col in df.columns for col in ['Clicks', 'Impressions', 'Position']):
+                    df = df.assign(**{col: default for col, default in _GSC_DEFAULTS.items() if col not in df.columns})
+                    df = DataLoader.to_numeric_columns(df, _GSC_DEFAULTS, _GSC_DTYPES)
             
-            # Supprimer les doublons d'URL
-            df = df.drop_duplicates(subset=['Address'], keep='first')
+            # Supprimer les doublons d'URL (dédoublonnage sur empreintes uint64 plutôt que sur les chaînes)
+            address_hash = pd.util.hash_array(df['Address'].to_numpy(dtype=object), categorize=False)
+            df = df[~pd.Index(address_hash).duplicated(keep='first')]
+            
+            # Indexer une fois sur l'URL normalisée pour la jointure avec GSC
+            df.index = DataLoader.url_key(df['Address'])
             
-            self.crawl_data = df
             st.success(f"✅ {len(df)} pages chargées depuis Screaming Frog")
             
             return df
             
         except Exception as e:
             st.error(f"❌ Erreur lors du chargement du fichier SF: {str(e)}")
-            import traceback
-            st.code(traceback.format_exc())
+            if debug:
+                st.code(traceback.format_exc())
             return None
     
     def load_gsc_data(self, file) -> Optional[pd.DataFrame]:
         """Charge les données Google Search Console"""
+        df = self._parse_gsc_data(file.getvalue(), file.name, st.session_state.get('debug', False))
+        if df is not None:
+            self.gsc_data = df
+        return df
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=4, hash_funcs={bytes: _hash_upload})
+    def _parse_gsc_data(data: bytes, file_name: str, debug: bool = False) -> Optional[pd.DataFrame]:
+        """Lit et nettoie l'export GSC (mis en cache sur le contenu du fichier et le mode debug)"""
         try:
-            if file.name.endswith('.csv'):
-                df = pd.read_csv(file, encoding='utf-8-sig')
-            else:
-                # Pour Excel GSC, lire la feuille "Pages"
-                excel_file = pd.ExcelFile(file)
-                sheet_name = None
-                
-                # Chercher la feuille "Pages"
-                for name in excel_file.sheet_names:
-                    if 'page' in name.lower():
-                        sheet_name = name
-                        break
-                
-                if sheet_name is None:
-                    sheet_name = excel_file.sheet_names[0]
-                
-                st.info(f"📑 Lecture de la feuille GSC: {sheet_name}")
-                df = pd.read_excel(file, sheet_name=sheet_name)
+            df = DataLoader.read_table(data, file_name, [_GSC_COLUMN_MAPPING], ['page'])
             
-            df.columns = df.columns.str.strip()
+            st.info(f"📋 Colonnes GSC détectées: {', '.join(DataLoader.available_columns(df))}")
             
-            st.info(f"📋 Colonnes GSC détectées: {', '.join(df.columns)}")
-            
-            # Mapping des colonnes GSC (FR + EN)
-            column_mapping = {
-                'Page': ['page', 'pages les plus populaires', 'url', 'landing page', 
-                        'top pages', 'page url', 'pages'],
-                'Clicks': ['clicks', 'clics', 'click', 'clic'],
-                'Impressions': ['impressions', 'impression', 'impress'],
-                'CTR': ['ctr', 'click-through rate', 'taux de clic'],
-                'Position': ['position', 'avg position', 'average position', 'pos']
-            }
-            
-            df = self.normalize_column_names(df, column_mapping)
+            df = DataLoader.normalize_column_names(df, _GSC_COLUMN_MAPPING)
             
             # Vérifier la colonne URL
             if 'Page' not in df.columns:
                 st.error("❌ Impossible de trouver la colonne URL/Page dans GSC.")
-                st.info(f"Colonnes disponibles: {', '.join(df.columns)}")
+                st.info(f"Colonnes disponibles: {', '.join(DataLoader.available_columns(df))}")
                 return None
             
             # Créer les colonnes manquantes
@@ -206,87 +394,74 @@ class DataLoader:
                         df[col] = 0
                     st.warning(f"⚠️ Colonne '{col}' absente dans GSC, valeurs par défaut utilisées")
             
-            # Nettoyage
-            df['Clicks'] = pd.to_numeric(df['Clicks'], errors='coerce').fillna(0)
-            df['Impressions'] = pd.to_numeric(df['Impressions'], errors='coerce').fillna(0)
-            df['Position'] = pd.to_numeric(df['Position'], errors='coerce').fillna(100)
-            df['CTR'] = pd.to_numeric(df['CTR'], errors='coerce').fillna(0)
+            # Nettoyage (types compacts : ces champs tiennent largement sur 32 bits)
+            df = DataLoader.to_numeric_columns(df, _GSC_DEFAULTS, _GSC_DTYPES)
             
-            # Supprimer les doublons
-            df = df.drop_duplicates(subset=['Page'], keep='first')
+            # Indexer une fois sur l'URL normalisée pour la jointure avec le crawl, puis supprimer
+            # les doublons sur cette empreinte (couvre aussi les Page identiques : jointure m:1)
+            df.index = DataLoader.url_key(df['Page'])
+            df = df[~df.index.duplicated(keep='first')]
             
-            self.gsc_data = df
             st.success(f"✅ {len(df)} pages GSC chargées")
             return df
             
         except Exception as e:
             st.error(f"❌ Erreur lors du chargement GSC: {str(e)}")
-            import traceback
-            st.code(traceback.format_exc())
+            if debug:
+                st.code(traceback.format_exc())
             return None
     
     def load_inlinks(self, file) -> Optional[pd.DataFrame]:
         """Charge le fichier des liens entrants"""
+        df = self._parse_inlinks(file.getvalue(), file.name, st.session_state.get('debug', False))
+        if df is not None:
+            self.inlinks_data = df
+        return df
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=4, hash_funcs={bytes: _hash_upload})
+    def _parse_inlinks(data: bytes, file_name: str, debug: bool = False) -> Optional[pd.DataFrame]:
+        """Lit et nettoie les liens entrants (mis en cache sur le contenu du fichier et le mode debug)"""
         try:
-            if file.name.endswith('.csv'):
-                df = pd.read_csv(file, encoding='utf-8-sig')
-            else:
-                # Pour Excel, lire la feuille qui contient "lien"
-                excel_file = pd.ExcelFile(file)
-                sheet_name = None
-                for name in excel_file.sheet_names:
-                    if 'lien' in name.lower() or 'link' in name.lower():
-                        sheet_name = name
-                        break
-                
-                if sheet_name is None:
-                    sheet_name = excel_file.sheet_names[0]
-                
-                st.info(f"📑 Lecture de la feuille: {sheet_name}")
-                df = pd.read_excel(file, sheet_name=sheet_name)
-            
-            df.columns = df.columns.str.strip()
+            df = DataLoader.read_table(data, file_name, [_INLINKS_COLUMN_MAPPING], ['lien', 'link'])
             
-            st.info(f"📋 Colonnes Inlinks: {', '.join(list(df.columns)[:10])}")
+            st.info(f"📋 Colonnes Inlinks: {', '.join(DataLoader.available_columns(df)[:10])}")
             
-            # Mapping des colonnes de liens (FR + EN)
-            column_mapping = {
-                'Source': ['source', 'de', 'from', 'source url', 'source address', 'link from'],
-                'Destination': ['destination', 'à', 'a', 'target', 'to', 'destination url', 
-                               'destination address', 'link to'],
-                'Anchor': ['anchor', "texte d'ancrage", "texte d ancrage", 'anchor text', 
-                          'link text', 'ancre', 'text']
-            }
-            
-            df = self.normalize_column_names(df, column_mapping)
+            df = DataLoader.normalize_column_names(df, _INLINKS_COLUMN_MAPPING)
             
             # Vérifier les colonnes essentielles
             if 'Source' not in df.columns or 'Destination' not in df.columns:
                 st.error(f"❌ Colonnes Source/Destination manquantes.")
-                st.info(f"Colonnes disponibles: {', '.join(df.columns)}")
+                st.info(f"Colonnes disponibles: {', '.join(DataLoader.available_columns(df))}")
                 return None
             
             if 'Anchor' not in df.columns:
                 df['Anchor'] = ''
                 st.warning("⚠️ Colonne 'Anchor' absente, valeurs vides utilisées")
             
-            # Supprimer les doublons
-            df = df.drop_duplicates(subset=['Source', 'Destination'], keep='first')
+            # Stocker les URLs en catégories : chaque URL n'est conservée (et hachée) qu'une fois
+            source = df['Source'].astype('category')
+            destination = df['Destination'].astype('category')
+            
+            # Supprimer les doublons sur une clé entière (code source, code destination)
+            width = len(destination.cat.categories) + 1
+            pair_key = (source.cat.codes.to_numpy(np.int64) + 1) * width + destination.cat.codes.to_numpy(np.int64) + 1
+            df = df.assign(Source=source, Destination=destination)[~pd.Index(pair_key).duplicated(keep='first')]
             
-            self.inlinks_data = df
             st.success(f"✅ {len(df)} liens internes chargés")
             return df
             
         except Exception as e:
             st.error(f"❌ Erreur lors du chargement des liens: {str(e)}")
-            import traceback
-            st.code(traceback.format_exc())
+            if debug:
+                st.code(traceback.format_exc())
             return None
     
     def load_html_content(self, file) -> Optional[Dict]:
         """Charge le fichier HTML (optionnel pour visualisation)"""
         try:
-            content = file.read().decode('utf-8')
+            # Contenu conservé en octets : décodé seulement à l'affichage (voir get_html_text)
+            content = file.read()
             self.html_content = {'filename': file.name, 'content': content}
             st.success(f"✅ Contenu HTML chargé: {file.name}")
             return self.html_content
@@ -295,57 +470,67 @@ class DataLoader:
             st.error(f"❌ Erreur lors du chargement HTML: {str(e)}")
             return None
     
+    def get_html_text(self) -> Optional[str]:
+        """Décode à la demande le contenu HTML chargé"""
+        if self.html_content is None:
+            return None
+        return self.html_content['content'].decode('utf-8', errors='replace')
+    
     def merge_data(self) -> Optional[pd.DataFrame]:
         """Fusionne toutes les données en un DataFrame unique"""
-        if self.crawl_data is None:
+        # GSC déjà intégré et typé au chargement du crawl : rien à fusionner (ni à hacher pour le cache)
+        if self.crawl_data is not None and self.gsc_in_sf:
+            st.success("✨ Données GSC déjà intégrées dans le crawl Screaming Frog!")
+            st.success(f"✅ Données fusionnées: {len(self.crawl_data)} pages au total")
+            return self.crawl_data.reset_index(drop=True)
+        return self._merge(self.crawl_data, self.gsc_data)
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=4)
+    def _merge(crawl_data: Optional[pd.DataFrame], gsc_data: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        """Fusion crawl / GSC (mise en cache sur le contenu des deux DataFrames)"""
+        if crawl_data is None:
             st.error("❌ Données Screaming Frog manquantes")
             return None
         
-        merged = self.crawl_data.copy()
+        merged = crawl_data
         
-        # Vérifier si GSC est déjà dans le crawl SF
-        has_gsc_in_sf = all(col in merged.columns for col in ['Clicks', 'Impressions', 'Position'])
-        
-        if has_gsc_in_sf:
-            st.success("✨ Données GSC déjà intégrées dans le crawl Screaming Frog!")
-        elif self.gsc_data is not None:
-            # Fusion avec GSC externe
-            # Normaliser les URLs pour améliorer le matching
-            merged['Address_clean'] = merged['Address'].str.lower().str.strip().str.rstrip('/')
-            gsc_clean = self.gsc_data.copy()
-            gsc_clean['Page_clean'] = gsc_clean['Page'].str.lower().str.strip().str.rstrip('/')
-            
+        if gsc_data is not None:
+            # Fusion avec GSC externe sur l'index d'URL normalisée construit au chargement
             before_merge = len(merged)
-            merged = merged.merge(
-                gsc_clean,
-                left_on='Address_clean',
-                right_on='Page_clean',
+            merged = merged.join(
+                gsc_data[['Clicks', 'Impressions', 'CTR', 'Position']],
                 how='left',
-                suffixes=('', '_gsc')
+                rsuffix='_gsc',
+                sort=False,
+                validate='m:1'
             )
-            merged.drop(columns=['Page', 'Address_clean', 'Page_clean'], inplace=True, errors='ignore')
-            
-            # Utiliser les colonnes GSC externes si pas déjà présentes
-            for col in ['Clicks', 'Impressions', 'Position', 'CTR']:
-                if f'{col}_gsc' in merged.columns:
-                    merged[col] = merged[f'{col}_gsc'].fillna(merged.get(col, 0))
-                    merged.drop(columns=[f'{col}_gsc'], inplace=True, errors='ignore')
             
-            # Remplir les valeurs manquantes
-            merged['Clicks'] = merged.get('Clicks', pd.Series([0]*len(merged))).fillna(0)
-            merged['Impressions'] = merged.get('Impressions', pd.Series([0]*len(merged))).fillna(0)
-            merged['Position'] = merged.get('Position', pd.Series([100]*len(merged))).fillna(100)
-            merged['CTR'] = merged.get('CTR', pd.Series([0]*len(merged))).fillna(0)
+            # Utiliser les colonnes GSC externes si pas déjà présentes (fusion des suffixes en une passe)
+            overlap = [col for col in ['Clicks', 'Impressions', 'Position', 'CTR'] if f'{col}_gsc' in merged.columns]
+            if overlap:
+                merged = merged.assign(**{
+                    col: merged[f'{col}_gsc'].fillna(pd.to_numeric(merged[col], errors='coerce'))
+                    for col in overlap
+                }).drop(columns=[f'{col}_gsc' for col in overlap])
             
             matched = (merged['Impressions'] > 0).sum()
             st.info(f"🔗 {matched} pages matchées avec les données GSC externes")
         else:
-            # Pas de GSC du tout
-            merged['Clicks'] = 0
-            merged['Impressions'] = 0
-            merged['Position'] = 100
-            merged['CTR'] = 0
+            # Pas de GSC du tout : colonnes vides (en une passe), remplies par les valeurs par défaut
+            merged = merged.assign(**dict.fromkeys(_GSC_DEFAULTS, float('nan')))
             st.warning("⚠️ Aucune donnée GSC disponible. L'analyse sera basée uniquement sur le crawl.")
         
+        # Même chemin pour les trois cas : conversion, valeurs par défaut et types compacts
+        merged = DataLoader.to_numeric_columns(merged, _GSC_DEFAULTS, _GSC_DTYPES)
+        
         st.success(f"✅ Données fusionnées: {len(merged)} pages au total")
-        return merged
+        return merged.reset_index(drop=True)
+
+
+# Lecteurs par extension de fichier (les autres extensions sont lues comme Excel)
+_READERS = {
+    '.csv': lambda file, column_mappings, sheet_keywords: DataLoader.read_csv_columns(file, column_mappings),
+    '.parquet': lambda file, column_mappings, sheet_keywords: DataLoader.read_parquet_columns(file, column_mappings),
+    '.xlsx': DataLoader.read_excel_sheet,
+}
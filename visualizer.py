@@ -1,37 +1,107 @@
 import plotly.graph_objects as go
 import plotly.express as px
 import networkx as nx
+import numpy as np
 import pandas as pd
+import streamlit as st
 from typing import Optional
+from config import SCATTER_MAX_POINTS, NETWORK_MAX_LINKS, NETWORK_MAX_LABELED_LINKS
+
+try:
+    import igraph as ig  # Layout Fruchterman-Reingold en C (optionnel)
+except ImportError:
+    ig = None
+
+__all__ = ['SEOVisualizer']
+
+# Feuille de style et ouverture du conteneur des cartes de statistiques
+_STATS_CARDS_HEADER = """
+        <style>
+        .stats-container {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+            gap: 20px;
+            margin: 20px 0;
+        }
+        .stat-card {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            padding: 20px;
+            border-radius: 10px;
+            color: white;
+            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+        }
+        .stat-value {
+            font-size: 32px;
+            font-weight: bold;
+            margin: 10px 0;
+        }
+        .stat-label {
+            font-size: 14px;
+            opacity: 0.9;
+        }
+        </style>
+        <div class="stats-container">
+        """
+
+# Gabarit d'une carte de statistique
+_STAT_CARD_TEMPLATE = """
+            <div class="stat-card">
+                <div class="stat-label">{emoji} {label}</div>
+                <div class="stat-value">{value}</div>
+            </div>
+            """
 
 
 class SEOVisualizer:
-    """Classe pour créer les visualisations"""
+    """Classe pour créer les visualisations (figures mises en cache sur le contenu des données)"""
+    
+    @staticmethod
+    def _as_numeric(values: pd.Series) -> pd.Series:
+        """Colonne numérique, NaN remplacés par 0 (conversion seulement si la colonne n'est pas déjà numérique)"""
+        if values.dtype.kind not in 'biuf':
+            values = pd.to_numeric(values, errors='coerce')
+        return values.fillna(0) if values.hasnans else values
     
     @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=4)
     def plot_priority_distribution(df: pd.DataFrame) -> go.Figure:
         """Graphique de distribution des scores de priorité"""
-        fig = px.histogram(
-            df,
-            x='Priority_Score',
-            nbins=50,
+        # Comptage par classe côté serveur : une seule trace Bar, sans le pipeline plotly.express
+        scores = df['Priority_Score'].to_numpy(dtype=float)
+        counts, edges = np.histogram(scores[np.isfinite(scores)], bins=50)
+        
+        fig = go.Figure(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=edges[1] - edges[0],
+            marker_color='#1f77b4'
+        ))
+        fig.update_layout(
             title='Distribution des Scores de Priorité',
-            labels={'Priority_Score': 'Score de Priorité', 'count': 'Nombre de pages'},
-            color_discrete_sequence=['#1f77b4']
+            xaxis_title='Score de Priorité',
+            yaxis_title='Nombre de pages',
+            bargap=0,
+            showlegend=False
         )
-        fig.update_layout(showlegend=False)
         return fig
     
     @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=4)
     def plot_link_score_vs_depth(df: pd.DataFrame) -> go.Figure:
         """Scatter plot Link Score vs Profondeur"""
+        # Échantillon uniforme au-delà de SCATTER_MAX_POINTS pages (navigateur fluide sur les gros crawls)
+        sampled = len(df) > SCATTER_MAX_POINTS
+        
+        # Uniquement les colonnes tracées (pas de copie du crawl complet)
+        df_clean = df[['Crawl Depth', 'Link Score', 'Priority_Score', 'Address', 'Clicks', 'Impressions']]
+        if sampled:
+            df_clean = df_clean.sample(n=SCATTER_MAX_POINTS, random_state=0)
+        
         # Nettoyer les données pour la visualisation
-        df_clean = df.copy()
-        df_clean['Impressions'] = pd.to_numeric(df_clean['Impressions'], errors='coerce').fillna(0)
-        df_clean['Impressions'] = df_clean['Impressions'].clip(lower=0)
+        impressions = SEOVisualizer._as_numeric(df_clean['Impressions']).clip(lower=0)
         
         # Ajouter une petite valeur pour éviter les points de taille 0
-        df_clean['Impressions_viz'] = df_clean['Impressions'] + 1
+        df_clean = df_clean.assign(Impressions=impressions, Impressions_viz=impressions + 1)
         
         fig = px.scatter(
             df_clean,
@@ -39,28 +109,36 @@ class SEOVisualizer:
             y='Link Score',
             size='Impressions_viz',
             color='Priority_Score',
-            hover_data=['Address', 'Clicks', 'Impressions'],
-            title='Link Score vs Profondeur de Crawl',
+            custom_data=['Address', 'Clicks', 'Impressions'],
+            title='Link Score vs Profondeur de Crawl' + (f' (échantillon de {SCATTER_MAX_POINTS} pages)' if sampled else ''),
             labels={
                 'Crawl Depth': 'Profondeur',
                 'Link Score': 'Link Score',
                 'Priority_Score': 'Score Priorité',
                 'Impressions_viz': 'Impressions'
             },
-            color_continuous_scale='Viridis'
+            color_continuous_scale='Viridis',
+            render_mode='webgl'  # Rendu WebGL : reste fluide sur les gros crawls
         )
+        # Survol explicite sur un seul tableau customdata (pas de gabarit généré par px)
+        fig.update_traces(hovertemplate=(
+            '%{customdata[0]}<br>Profondeur: %{x}<br>Link Score: %{y:.1f}'
+            '<br>Clics: %{customdata[1]:,}<br>Impressions: %{customdata[2]:,}'
+            '<br>Score Priorité: %{marker.color:.3f}<extra></extra>'
+        ))
         return fig
     
     @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=4)
     def plot_gsc_performance(df: pd.DataFrame, top_n: int = 20) -> go.Figure:
         """Graphique des performances GSC (top pages)"""
-        # Nettoyer les données
-        df_clean = df.copy()
-        df_clean['Impressions'] = pd.to_numeric(df_clean['Impressions'], errors='coerce').fillna(0)
-        df_clean['Clicks'] = pd.to_numeric(df_clean['Clicks'], errors='coerce').fillna(0)
+        # Nettoyer les données (seules les colonnes utiles, sans copier le DataFrame complet)
+        impressions = SEOVisualizer._as_numeric(df['Impressions'])
+        clicks = SEOVisualizer._as_numeric(df['Clicks'])
         
         # Filtrer les pages avec des impressions
-        df_clean = df_clean[df_clean['Impressions'] > 0]
+        mask = impressions > 0
+        df_clean = df.loc[mask, ['Address']].assign(Impressions=impressions[mask], Clicks=clicks[mask])
         
         if len(df_clean) == 0:
             fig = go.Figure()
@@ -74,35 +152,45 @@ class SEOVisualizer:
         
         top_pages = df_clean.nlargest(top_n, 'Impressions')
         
-        fig = go.Figure()
-        
-        fig.add_trace(go.Bar(
-            name='Impressions',
-            x=top_pages['Address'].str[-30:],  # Tronquer l'URL
-            y=top_pages['Impressions'],
-            yaxis='y',
-            offsetgroup=1
-        ))
-        
-        fig.add_trace(go.Bar(
-            name='Clics',
-            x=top_pages['Address'].str[-30:],
-            y=top_pages['Clicks'],
-            yaxis='y',
-            offsetgroup=2
-        ))
+        # Tronquer l'URL (fin) une seule fois pour les deux séries
+        url_labels = top_pages['Address'].astype(str).str.slice(-30).to_numpy(dtype=object)
         
-        fig.update_layout(
-            title=f'Top {len(top_pages)} Pages - Performances GSC',
-            xaxis={'title': 'URL (fin)', 'tickangle': -45},
-            yaxis={'title': 'Nombre'},
-            barmode='group',
-            height=500
-        )
+        # Figure décrite en un seul dict : une passe de validation Plotly au lieu d'un add_trace par série
+        fig = go.Figure({
+            'data': [
+                {'type': 'bar', 'name': 'Impressions', 'x': url_labels,
+                 'y': top_pages['Impressions'].to_numpy(), 'yaxis': 'y', 'offsetgroup': 1},
+                {'type': 'bar', 'name': 'Clics', 'x': url_labels,
+                 'y': top_pages['Clicks'].to_numpy(), 'yaxis': 'y', 'offsetgroup': 2}
+            ],
+            'layout': {
+                'title': {'text': f'Top {len(top_pages)} Pages - Performances GSC'},
+                'xaxis': {'title': {'text': 'URL (fin)'}, 'tickangle': -45},
+                'yaxis': {'title': {'text': 'Nombre'}},
+                'barmode': 'group',
+                'height': 500
+            }
+        })
         
         return fig
     
     @staticmethod
+    def _graph_layout(G: nx.DiGraph, nodes: list, edges: np.ndarray) -> np.ndarray:
+        """Positions (n, 2) des noeuds : igraph si installé, sinon (ou en cas d'échec) spring_layout NetworkX"""
+        if ig is not None:
+            try:
+                g = ig.Graph(n=len(nodes), edges=edges.tolist(), directed=True)
+                return np.array(g.layout_fruchterman_reingold(niter=50).coords, dtype=float).reshape(-1, 2)
+            except Exception:
+                pass  # Repli sur NetworkX
+        try:
+            pos = nx.spring_layout(G, k=2, iterations=50)
+        except Exception:
+            pos = nx.random_layout(G)
+        return np.array([pos[node] for node in nodes], dtype=float).reshape(-1, 2)
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=10)
     def plot_network_graph(opportunities: pd.DataFrame, max_links: int = 50) -> go.Figure:
         """Visualisation du graphe de liens recommandés"""
         
@@ -116,73 +204,63 @@ class SEOVisualizer:
             )
             return fig
         
-        # Limiter le nombre de liens pour la lisibilité
-        top_opportunities = opportunities.head(max_links)
+        # Limiter le nombre de liens pour la lisibilité (plafond dur pour ne pas saturer Plotly)
+        truncated = max_links > NETWORK_MAX_LINKS and len(opportunities) > NETWORK_MAX_LINKS
+        top_opportunities = opportunities.head(min(max_links, NETWORK_MAX_LINKS))
         
-        # Créer le graphe
+        # Créer le graphe (arêtes pondérées ajoutées en bloc depuis des tuples bruts)
         G = nx.DiGraph()
+        G.add_weighted_edges_from(
+            top_opportunities[['Source', 'Target', 'Opportunity_Score']].itertuples(index=False, name=None)
+        )
         
-        for _, row in top_opportunities.iterrows():
-            G.add_edge(
-                row['Source'],
-                row['Target'],
-                weight=row['Opportunity_Score']
-            )
+        # Noeuds et arêtes en indices entiers
+        nodes = list(G.nodes())
+        node_index = {node: i for i, node in enumerate(nodes)}
+        edges = np.fromiter(
+            (node_index[node] for edge in G.edges() for node in edge),
+            dtype=np.int32,
+            count=2 * G.number_of_edges()
+        ).reshape(-1, 2)
         
         # Position des noeuds
-        try:
-            pos = nx.spring_layout(G, k=2, iterations=50)
-        except:
-            pos = nx.random_layout(G)
-        
-        # Extraire les coordonnées des arêtes
-        edge_x = []
-        edge_y = []
+        node_pos = SEOVisualizer._graph_layout(G, nodes, edges)
         
-        for edge in G.edges():
-            x0, y0 = pos[edge[0]]
-            x1, y1 = pos[edge[1]]
-            edge_x.extend([x0, x1, None])
-            edge_y.extend([y0, y1, None])
+        # Segments des arêtes (x0, x1, NaN) remplis en bloc, NaN = coupure du tracé
+        edge_x = np.full(3 * len(edges), np.nan)
+        edge_y = np.full(3 * len(edges), np.nan)
+        edge_x[0::3], edge_y[0::3] = node_pos[edges[:, 0]].T
+        edge_x[1::3], edge_y[1::3] = node_pos[edges[:, 1]].T
         
+        # Arêtes en SVG comme les noeuds (une couche WebGL serait dessinée au-dessus d'eux) ;
+        # graphe déjà plafonné par max_links et NETWORK_MAX_LINKS
         edge_trace = go.Scatter(
             x=edge_x, y=edge_y,
+            connectgaps=False,
             line=dict(width=0.5, color='#888'),
-            hoverinfo='none',
+            hoverinfo='skip',  # Arêtes ignorées par la recherche du point survolé
             mode='lines',
             showlegend=False
         )
         
-        # Extraire les coordonnées des noeuds
-        node_x = []
-        node_y = []
-        node_text = []
-        node_hover = []
-        node_size = []
-        node_color = []
+        # Degrés calculés une seule fois, dans l'ordre des noeuds
+        degrees = np.fromiter((degree for _, degree in G.degree()), dtype=np.int32, count=len(nodes))
         
-        for node in G.nodes():
-            x, y = pos[node]
-            node_x.append(x)
-            node_y.append(y)
-            
-            # Tronquer l'URL pour l'affichage
-            display_url = node.split('/')[-1][:30] if '/' in node else node[:30]
-            node_text.append(display_url)
-            
-            # Info au survol
-            degree = G.degree(node)
-            node_hover.append(f"{node}<br>Connexions: {degree}")
-            
-            # Taille et couleur basées sur le degré
-            node_size.append(15 + degree * 3)
-            node_color.append(float(degree))
+        # Tronquer l'URL pour l'affichage
+        node_text = [node.rsplit('/', 1)[-1][:30] for node in nodes]
+        
+        # Info au survol
+        node_hover = [f"{node}<br>Connexions: {degree}" for node, degree in zip(nodes, degrees.tolist())]
+        
+        # Taille et couleur basées sur le degré
+        node_size = 15 + degrees * 3
+        node_color = degrees.astype(float)
         
         # Créer le trace des noeuds SANS colorbar problématique
         node_trace = go.Scatter(
-            x=node_x, 
-            y=node_y,
-            mode='markers+text',
+            x=node_pos[:, 0],
+            y=node_pos[:, 1],
+            mode='markers+text' if len(top_opportunities) <= NETWORK_MAX_LABELED_LINKS else 'markers',
             hovertext=node_hover,
             hoverinfo='text',
             text=node_text,
@@ -207,6 +285,7 @@ class SEOVisualizer:
             ),
             showlegend=False,
             hovermode='closest',
+            uirevision='graph',  # Conserver zoom / déplacement entre deux rendus
             margin=dict(b=20, l=5, r=5, t=40),
             xaxis=dict(
                 showgrid=False, 
@@ -222,39 +301,18 @@ class SEOVisualizer:
             plot_bgcolor='white'
         )
         
+        if truncated:
+            fig.add_annotation(
+                text=f"Affichage tronqué aux {NETWORK_MAX_LINKS} premières opportunités",
+                xref="paper", yref="paper",
+                x=0.5, y=-0.05, showarrow=False
+            )
+        
         return fig
     
     @staticmethod
     def display_stats_cards(stats: dict) -> str:
         """Génère le HTML pour afficher les statistiques sous forme de cartes"""
-        html = """
-        <style>
-        .stats-container {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 20px;
-            margin: 20px 0;
-        }
-        .stat-card {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            padding: 20px;
-            border-radius: 10px;
-            color: white;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }
-        .stat-value {
-            font-size: 32px;
-            font-weight: bold;
-            margin: 10px 0;
-        }
-        .stat-label {
-            font-size: 14px;
-            opacity: 0.9;
-        }
-        </style>
-        <div class="stats-container">
-        """
-        
         cards_data = [
             ("Pages analysées", stats.get('total_pages', 0), "📄"),
             ("Link Score moyen", f"{stats.get('avg_link_score', 0):.1f}", "⭐"),
@@ -264,13 +322,9 @@ class SEOVisualizer:
             ("Total Clics", f"{stats.get('total_clicks', 0):,.0f}", "🖱️"),
         ]
         
-        for label, value, emoji in cards_data:
-            html += f"""
-            <div class="stat-card">
-                <div class="stat-label">{emoji} {label}</div>
-                <div class="stat-value">{value}</div>
-            </div>
-            """
-        
-        html += "</div>"
-        return html
+        # Assemblage en une seule concaténation (feuille de style construite une fois au niveau module)
+        cards = [
+            _STAT_CARD_TEMPLATE.format(emoji=emoji, label=label, value=value)
+            for label, value, emoji in cards_data
+        ]
+        return _STATS_CARDS_HEADER + ''.join(cards) + "</div>"